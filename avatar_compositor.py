@@ -5,13 +5,20 @@ Composites a character image onto a portal background with masking.
 Supports both gradient fills and image fills for the portal.
 """
 
-import re
 import os
-from PIL import Image, ImageChops, ImageDraw
+import hashlib
+import math
+import threading
+import xml.etree.ElementTree as ET
+import PIL
+from PIL import Image, ImageChops, ImageDraw, ImageOps
 import requests
 from io import BytesIO
 from dataclasses import dataclass
-from typing import Tuple, Optional, Union
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Tuple, Optional, Union
 
 # Optional: cairosvg for SVG rendering
 try:
@@ -20,35 +27,116 @@ try:
 except ImportError:
     HAS_CAIROSVG = False
 
+# Optional: NumPy for vectorized gradient and alpha math (pure-Pillow fallback otherwise)
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+# Optional: numba for a compiled, multithreaded alpha-mask kernel (NumPy otherwise)
+try:
+    import numba
+    HAS_NUMBA = HAS_NUMPY
+except ImportError:
+    HAS_NUMBA = False
+
+# Optional: pillow-simd is a drop-in Pillow build with SSE4/AVX2 resize and
+# compositing (its versions carry a .postN suffix)
+HAS_PILLOW_SIMD = ".post" in PIL.__version__
+IMAGING_BACKEND = f"{'pillow-simd' if HAS_PILLOW_SIMD else 'Pillow'} {PIL.__version__}"
+
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
+_SVG_NS = "http://www.w3.org/2000/svg"
+_XLINK_NS = "http://www.w3.org/1999/xlink"
 
-@dataclass
+# Rotations smaller than this (degrees) are treated as none - the resampling
+# would cost a full BICUBIC pass for a sub-pixel change
+_MIN_ROTATION = 0.05
+
+# Width SVG shapes are rasterized at once; smaller masks are resized from it
+_SVG_MASTER_WIDTH = 1024
+
+# Shared HTTP session so repeated downloads reuse keep-alive connections
+_SESSION = requests.Session()
+
+# Cropped image-fill portals, keyed by shape/size/fill content (most recent last).
+# Gradient portals use lru_cache instead since gradients are hashable.
+_IMAGE_PORTAL_CACHE: "OrderedDict[tuple, Tuple[Optional[Image.Image], Tuple[int, int]]]" = OrderedDict()
+_IMAGE_PORTAL_CACHE_SIZE = 8
+_IMAGE_PORTAL_LOCK = threading.Lock()
+
+# Per-thread pool of reusable intermediate image buffers (most recent last)
+# and NumPy scratch arrays
+_BUFFER_POOL = threading.local()
+_BUFFER_POOL_SIZE = 4
+
+# Worker threads for rendering the portal and mask while the character is prepared
+_EXECUTOR = ThreadPoolExecutor(max_workers=2)
+
+
+@lru_cache(maxsize=64)
+def hex_to_rgb(hex_color: str) -> Tuple[int, int, int]:
+    """Convert hex color to RGB tuple."""
+    hex_color = hex_color.lstrip('#')
+    return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+
+
+# Supported PortalGradient directions
+GRADIENT_AXES = ("diagonal", "vertical", "horizontal")
+
+
+@dataclass(frozen=True)
 class PortalGradient:
     """Defines the linear gradient colors for the portal."""
-    start_color: str  # Hex color at top-right
-    end_color: str    # Hex color at bottom-left
+    start_color: str  # Hex color at top-right (top for vertical, right for horizontal)
+    end_color: str    # Hex color at bottom-left (bottom for vertical, left for horizontal)
+    axis: str = "diagonal"  # One of GRADIENT_AXES
+
+    def __post_init__(self):
+        if self.axis not in GRADIENT_AXES:
+            raise ValueError(f"Unsupported gradient axis: {self.axis}")
+        # Parse colors once; these aren't fields, so eq/hash are unaffected
+        object.__setattr__(self, "_start_rgb", hex_to_rgb(self.start_color))
+        object.__setattr__(self, "_end_rgb", hex_to_rgb(self.end_color))
+
+    @property
+    def start_rgb(self) -> Tuple[int, int, int]:
+        return self._start_rgb
+
+    @property
+    def end_rgb(self) -> Tuple[int, int, int]:
+        return self._end_rgb
 
     @classmethod
     def orange(cls) -> "PortalGradient":
-        return cls(start_color="#CE782D", end_color="#E1A371")
+        return ORANGE
 
     @classmethod
     def blue(cls) -> "PortalGradient":
-        return cls(start_color="#2D7ECE", end_color="#71A3E1")
+        return BLUE
 
     @classmethod
     def green(cls) -> "PortalGradient":
-        return cls(start_color="#2DCE78", end_color="#71E1A3")
+        return GREEN
 
     @classmethod
     def purple(cls) -> "PortalGradient":
-        return cls(start_color="#782DCE", end_color="#A371E1")
+        return PURPLE
 
     @classmethod
     def red(cls) -> "PortalGradient":
-        return cls(start_color="#CE2D2D", end_color="#E17171")
+        return RED
+
+
+# Built-in gradients (shared instances, PortalGradient is immutable)
+ORANGE = PortalGradient(start_color="#CE782D", end_color="#E1A371")
+BLUE = PortalGradient(start_color="#2D7ECE", end_color="#71A3E1")
+GREEN = PortalGradient(start_color="#2DCE78", end_color="#71E1A3")
+PURPLE = PortalGradient(start_color="#782DCE", end_color="#A371E1")
+RED = PortalGradient(start_color="#CE2D2D", end_color="#E17171")
 
 
 @dataclass
@@ -201,66 +289,237 @@ def compute_auto_config(
     )
 
 
-def hex_to_rgb(hex_color: str) -> Tuple[int, int, int]:
-    """Convert hex color to RGB tuple."""
-    hex_color = hex_color.lstrip('#')
-    return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+def create_gradient_image(size: Tuple[int, int], gradient: PortalGradient) -> Image.Image:
+    """Create a linear gradient image (top-right to bottom-left by default)."""
+    if gradient.start_rgb == gradient.end_rgb:
+        return Image.new("RGB", size, gradient.start_rgb)
 
+    if not HAS_NUMPY:
+        return _create_gradient_image_pil(size, gradient)
 
-def create_gradient_image(size: Tuple[int, int], gradient: PortalGradient) -> Image.Image:
-    """Create a linear gradient image (top-right to bottom-left)."""
     width, height = size
-    img = Image.new("RGB", size)
+    offset, x_coef, y_coef, denom = _gradient_ramp(size, gradient.axis)
+
+    start_rgb = np.array(gradient.start_rgb, dtype=np.float32)
+    end_rgb = np.array(gradient.end_rgb, dtype=np.float32)
+
+    # t is separable into a row and a column term, so the color is too: one
+    # color per column plus one delta per row. Summing them straight into the
+    # uint8 output means no full-size t or float RGB array is ever built.
+    delta = end_rgb - start_rgb
+    inv_denom = np.float32(1.0 / denom)
+    t_x = (offset + x_coef * np.arange(width, dtype=np.float32)) * inv_denom
+    t_y = (y_coef * np.arange(height, dtype=np.float32)) * inv_denom
+    column_colors = start_rgb + t_x[None, :, None] * delta
+    row_deltas = t_y[:, None, None] * delta
+
+    rgb = np.empty((height, width, 3), dtype=np.uint8)
+    if gradient.axis == "vertical":
+        # Axis-aligned gradients only vary along one axis - convert that
+        # single column or row and broadcast it across the other
+        rgb[...] = (start_rgb + row_deltas).astype(np.uint8)
+    elif gradient.axis == "horizontal":
+        rgb[...] = column_colors.astype(np.uint8)
+    else:
+        np.add(column_colors, row_deltas, out=rgb, casting="unsafe")
+    return Image.fromarray(rgb, "RGB")
+
+
+def _create_gradient_image_pil(size: Tuple[int, int], gradient: PortalGradient) -> Image.Image:
+    """Pure-Pillow version of create_gradient_image, used when NumPy isn't installed."""
+    offset, x_coef, y_coef, denom = _gradient_ramp(size, gradient.axis)
+
+    # Map Pillow's 256px vertical ramp onto the gradient: each output pixel
+    # samples ramp row 255 * t (transform coordinates are pixel centers)
+    k = 255 / denom
+    t = Image.linear_gradient("L").transform(
+        size,
+        Image.Transform.AFFINE,
+        (0, 0, 128, k * x_coef, k * y_coef, k * (offset - 0.5 * (x_coef + y_coef)) + 0.5),
+        resample=Image.Resampling.BILINEAR
+    )
 
-    start_rgb = hex_to_rgb(gradient.start_color)
-    end_rgb = hex_to_rgb(gradient.end_color)
+    # Colorize maps the ramp straight to RGB via a lookup table
+    return ImageOps.colorize(t, black=gradient.start_rgb, white=gradient.end_rgb)
 
-    for y in range(height):
-        for x in range(width):
-            # Diagonal gradient from top-right to bottom-left
-            t = ((width - x) + y) / (width + height)
-            r = int(start_rgb[0] * (1 - t) + end_rgb[0] * t)
-            g = int(start_rgb[1] * (1 - t) + end_rgb[1] * t)
-            b = int(start_rgb[2] * (1 - t) + end_rgb[2] * t)
-            img.putpixel((x, y), (r, g, b))
 
-    return img
+def _gradient_ramp(size: Tuple[int, int], axis: str) -> Tuple[int, int, int, int]:
+    """
+    Gradient parameter for pixel (x, y) as t = (offset + x_coef * x + y_coef * y) / denom.
+
+    Returns (offset, x_coef, y_coef, denom); t runs from 0 at the start
+    color to 1 at the end color.
+    """
+    width, height = size
+    if axis == "vertical":
+        return 0, 0, 1, max(height - 1, 1)
+    if axis == "horizontal":
+        return width - 1, -1, 0, max(width - 1, 1)
+    # Diagonal from top-right to bottom-left
+    return width, -1, 1, width + height
 
 
 def load_shape_mask(shape_path: str, size: Tuple[int, int]) -> Image.Image:
-    """Load a shape mask from PNG or SVG file."""
+    """Load a shape mask from PNG or SVG file.
+
+    Rasterized masks are cached by (path, modification time, size), so
+    repeated calls with the same shape skip the decode/render entirely.
+    """
+    return _shared_shape_mask(shape_path, size).copy()
+
+
+def _shared_shape_mask(shape_path: str, size: Tuple[int, int]) -> Image.Image:
+    """Cached shape mask shared between callers. Treat it as read-only."""
+    return _render_shape_mask(shape_path, os.path.getmtime(shape_path), tuple(size))
+
+
+@lru_cache(maxsize=32)
+def _render_shape_mask(shape_path: str, mtime: float, size: Tuple[int, int]) -> Image.Image:
+    """Rasterize a shape mask. ``mtime`` is only part of the cache key."""
+    master = _shape_master(shape_path, mtime)
+
     if shape_path.endswith('.svg'):
-        if not HAS_CAIROSVG:
-            raise ImportError("cairosvg required for SVG. Install with: pip install cairosvg")
+        extent = _svg_master_extent(shape_path, mtime, master)
+        if min(size[0] / extent[0], size[1] / extent[1]) > 1:
+            # Upscaling the master would blur edges - render directly instead
+            return _rasterize_svg(shape_path, size)
+        return _fit_master(master, extent, size)
 
-        with open(shape_path, "r") as f:
-            svg_content = f.read()
+    # Resize to target size
+    if master.size != size:
+        return master.resize(size, Image.Resampling.LANCZOS)
+    return master
 
-        # Replace fill with white for mask
-        svg_content = re.sub(r'fill="[^"]*"', 'fill="white"', svg_content)
 
-        png_bytes = cairosvg.svg2png(
-            bytestring=svg_content.encode('utf-8'),
-            output_width=size[0],
-            output_height=size[1]
-        )
-        img = Image.open(BytesIO(png_bytes)).convert("RGBA")
+@lru_cache(maxsize=8)
+def _shape_master(shape_path: str, mtime: float) -> Image.Image:
+    """
+    Decode a shape once at its master resolution as an L mask.
+
+    SVGs are rasterized _SVG_MASTER_WIDTH wide at their own aspect ratio;
+    PNGs are used at their native size. Treat the result as read-only.
+    """
+    if shape_path.endswith('.svg'):
+        return _rasterize_svg(shape_path, (_SVG_MASTER_WIDTH, None))
+
+    # PNG shape - use alpha channel or convert to grayscale
+    img = Image.open(shape_path)
+    if img.mode == 'RGBA':
         return img.getchannel("A")
+    elif img.mode == 'L':
+        img.load()
+        return img
     else:
-        # PNG shape - use alpha channel or convert to grayscale
-        img = Image.open(shape_path)
-        if img.mode == 'RGBA':
-            mask = img.getchannel("A")
-        elif img.mode == 'L':
-            mask = img
-        else:
-            mask = img.convert("L")
+        return img.convert("L")
 
-        # Resize to target size
-        if mask.size != size:
-            mask = mask.resize(size, Image.Resampling.LANCZOS)
 
-        return mask
+def _svg_master_extent(
+    shape_path: str,
+    mtime: float,
+    master: Image.Image
+) -> Tuple[float, float]:
+    """
+    Size of the SVG's viewBox in master pixels.
+
+    cairosvg truncates the canvas to whole pixels but not the content, so
+    this is taken from the SVG itself rather than from master.size.
+    """
+    root = ET.parse(shape_path).getroot()
+    dims = (root.get("viewBox") or "").replace(",", " ").split()[2:]
+    if len(dims) != 2:
+        dims = [root.get("width", ""), root.get("height", "")]
+    try:
+        width, height = (float(d) for d in dims)
+    except ValueError:
+        return master.size
+    return _SVG_MASTER_WIDTH, _SVG_MASTER_WIDTH * height / width
+
+
+def _fit_master(
+    master: Image.Image,
+    extent: Tuple[float, float],
+    size: Tuple[int, int]
+) -> Image.Image:
+    """
+    Resample a master raster into size the way cairosvg places an SVG.
+
+    Follows the default preserveAspectRatio ("xMidYMid meet"): the extent is
+    scaled uniformly to fit and centred at sub-pixel precision, in a single
+    LANCZOS pass over the matching window of the master.
+    """
+    width, height = size
+    scale = min(width / extent[0], height / extent[1])
+
+    # The output canvas in master pixels - it overhangs the master on the
+    # axis with spare room, so pad the master with transparency to cover it
+    left = (extent[0] - width / scale) / 2
+    top = (extent[1] - height / scale) / 2
+    right, bottom = left + width / scale, top + height / scale
+    pad_left, pad_top = math.ceil(max(-left, 0)), math.ceil(max(-top, 0))
+    pad_right = math.ceil(max(right - master.width, 0))
+    pad_bottom = math.ceil(max(bottom - master.height, 0))
+    if pad_left or pad_top or pad_right or pad_bottom:
+        padded = Image.new(
+            "L", (master.width + pad_left + pad_right, master.height + pad_top + pad_bottom), 0
+        )
+        padded.paste(master, (pad_left, pad_top))
+        master = padded
+
+    box = (max(left + pad_left, 0), max(top + pad_top, 0),
+           min(right + pad_left, master.width), min(bottom + pad_top, master.height))
+    return master.resize(size, Image.Resampling.LANCZOS, box=box)
+
+
+def _rasterize_svg(shape_path: str, size: Tuple[int, Optional[int]]) -> Image.Image:
+    """Render an SVG shape with white fills and return its alpha band.
+
+    A height of None keeps the SVG's own aspect ratio.
+    """
+    if not HAS_CAIROSVG:
+        raise ImportError("cairosvg required for SVG. Install with: pip install cairosvg")
+
+    png_bytes = cairosvg.svg2png(
+        bytestring=_white_svg(shape_path, os.path.getmtime(shape_path)),
+        output_width=size[0],
+        output_height=size[1]
+    )
+    # cairosvg emits RGBA PNGs - take the alpha band without an RGBA copy
+    img = Image.open(BytesIO(png_bytes))
+    if img.mode != "RGBA":
+        img = img.convert("RGBA")
+    return img.getchannel("A")
+
+
+@lru_cache(maxsize=8)
+def _white_svg(shape_path: str, mtime: float) -> bytes:
+    """
+    Serialize a shape SVG with every element filled white, for masks.
+
+    Fills set in style attributes are dropped so they can't override the
+    fill attribute. ``mtime`` is only part of the cache key.
+
+    The SVG and xlink namespaces are written back as plain ``xmlns``
+    declarations, so the output keeps its unprefixed tags without
+    registering namespaces with ElementTree globally.
+    """
+    root = ET.parse(shape_path).getroot()
+    has_xlink = False
+    for element in root.iter():
+        if element.tag.startswith("{%s}" % _SVG_NS):
+            element.tag = element.tag[len(_SVG_NS) + 2:]
+        for key in [k for k in element.attrib if k.startswith("{%s}" % _XLINK_NS)]:
+            element.set("xlink:" + key[len(_XLINK_NS) + 2:], element.attrib.pop(key))
+            has_xlink = True
+        element.set("fill", "white")
+        style = element.get("style")
+        if style is not None:
+            declarations = [d for d in style.split(";")
+                            if d.split(":", 1)[0].strip() != "fill"]
+            element.set("style", ";".join(declarations))
+    root.set("xmlns", _SVG_NS)
+    if has_xlink:
+        root.set("xmlns:xlink", _XLINK_NS)
+    return ET.tostring(root)
 
 
 def create_portal_with_fill(
@@ -276,51 +535,511 @@ def create_portal_with_fill(
         size: Output size
         fill: PortalGradient, image path, or PIL Image for the fill
     """
+    if isinstance(fill, PortalGradient):
+        return _render_gradient_portal(
+            shape_path, os.path.getmtime(shape_path), tuple(size), fill
+        )
+
     # Load shape mask
-    shape_mask = load_shape_mask(shape_path, size)
+    shape_mask = _shared_shape_mask(shape_path, size)
 
-    # Create or load fill
-    if isinstance(fill, PortalGradient):
-        fill_img = create_gradient_image(size, fill)
-    elif isinstance(fill, str):
+    # Load fill and scale it to the portal
+    fill_img = _resize_fill(_load_fill_image(fill, size), size)
+
+    return _apply_shape_mask(fill_img, shape_mask)
+
+
+def _load_fill_image(
+    fill: Union[str, Image.Image],
+    target_size: Optional[Tuple[int, int]] = None
+) -> Image.Image:
+    """
+    Load an image fill from path, URL, or PIL Image as RGB (not resized).
+
+    If target_size is given, JPEG fills are decoded in draft mode at the
+    smallest 1/2, 1/4 or 1/8 scale that still covers it - e.g. a 4000x4000
+    fill for the default config's 680x680 (2x internal) portal decodes at
+    1000x1000. An RGB PIL Image is returned itself, so treat the result as
+    read-only.
+    """
+    if isinstance(fill, str):
         # Load image from path or URL
         if fill.startswith(("http://", "https://")):
-            response = requests.get(fill, timeout=30)
-            response.raise_for_status()
-            fill_img = Image.open(BytesIO(response.content))
+            fill_img = _decode_image(BytesIO(_fetch_url(fill)), target_size)
         else:
-            fill_img = Image.open(fill)
-        fill_img = fill_img.convert("RGB").resize(size, Image.Resampling.LANCZOS)
+            fill_img = _decode_image(fill, target_size)
     elif isinstance(fill, Image.Image):
-        fill_img = fill.convert("RGB").resize(size, Image.Resampling.LANCZOS)
+        fill_img = fill
     else:
         raise ValueError(f"Unsupported fill type: {type(fill)}")
+    # Fills are only ever resampled into new images, so an RGB fill is used
+    # as-is instead of being copied by convert()
+    return fill_img if fill_img.mode == "RGB" else fill_img.convert("RGB")
+
+
+def _resize_fill(
+    img: Image.Image,
+    size: Tuple[int, int],
+    box: Optional[Tuple[float, float, float, float]] = None
+) -> Image.Image:
+    """
+    Resize a fill image (or its box region) to size.
+
+    Fills are background and get re-antialiased by the shape mask, so they
+    use cheaper filters than the character's LANCZOS: BOX for downscales
+    beyond 2x, BILINEAR otherwise.
+    """
+    if box is None:
+        box = (0, 0) + img.size
+    ratio = min((box[2] - box[0]) / size[0], (box[3] - box[1]) / size[1])
+    resample = Image.Resampling.BOX if ratio > 2 else Image.Resampling.BILINEAR
+    return img.resize(size, resample, box=box)
+
+
+def _render_image_portal_region(
+    shape_path: str,
+    size: Tuple[int, int],
+    fill: Union[str, Image.Image],
+    box: Tuple[int, int, int, int]
+) -> Image.Image:
+    """
+    Render only the box region of an image-filled portal of the given size.
+
+    The fill is scaled to the portal and cropped to box in a single
+    resampling pass, so pixels outside the shape are never resampled.
+    """
+    fill_img = _load_fill_image(fill, size)
+    scale_x = fill_img.width / size[0]
+    scale_y = fill_img.height / size[1]
+
+    # Map box into fill pixels, clamped so float error can't leave the image
+    left, top, right, bottom = box
+    fill_img = _resize_fill(
+        fill_img,
+        (right - left, bottom - top),
+        box=(left * scale_x, top * scale_y,
+             min(right * scale_x, fill_img.width), min(bottom * scale_y, fill_img.height))
+    )
+    shape_mask = _shared_shape_mask(shape_path, size).crop(box)
+    return _apply_shape_mask(fill_img, shape_mask)
+
+
+def _render_gradient_portal(
+    shape_path: str,
+    mtime: float,
+    size: Tuple[int, int],
+    gradient: PortalGradient
+) -> Image.Image:
+    """
+    Render a full gradient-filled portal.
 
-    # Apply shape mask to fill
-    result = Image.new("RGBA", size, (0, 0, 0, 0))
-    result.paste(fill_img, (0, 0))
-    result.putalpha(shape_mask)
+    Not cached itself - the compositor caches only the cropped layer
+    (_render_gradient_portal_layer), so each portal is held in memory once.
+    """
+    fill_img = create_gradient_image(size, gradient)
+    shape_mask = _render_shape_mask(shape_path, mtime, size)
+    return _apply_shape_mask(fill_img, shape_mask)
+
+
+def _portal_layer(
+    shape_path: str,
+    size: Tuple[int, int],
+    fill: Union[PortalGradient, str, Image.Image]
+) -> Tuple[Optional[Image.Image], Tuple[int, int]]:
+    """
+    Create the portal cropped to the bounding box of its shape.
+
+    Returns the cropped portal (None if the shape is empty) and the box's
+    top-left corner within the full portal, so only visible pixels get
+    composited.
+    """
+    mtime = os.path.getmtime(shape_path)
+    if isinstance(fill, PortalGradient):
+        return _render_gradient_portal_layer(shape_path, mtime, tuple(size), fill)
+
+    # Image fills are cached by content, so the same background (e.g. re-sent
+    # by the UI on every slider change) isn't decoded and resized again
+    cache_key = (shape_path, mtime, tuple(size), _fill_cache_key(fill))
+    with _IMAGE_PORTAL_LOCK:
+        if cache_key in _IMAGE_PORTAL_CACHE:
+            _IMAGE_PORTAL_CACHE.move_to_end(cache_key)
+            return _IMAGE_PORTAL_CACHE[cache_key]
+
+    bbox = _shape_bbox(shape_path, mtime, tuple(size))
+    if bbox is None:
+        layer = (None, (0, 0))
+    else:
+        layer = (_render_image_portal_region(shape_path, size, fill, bbox), bbox[:2])
+
+    with _IMAGE_PORTAL_LOCK:
+        _IMAGE_PORTAL_CACHE[cache_key] = layer
+        while len(_IMAGE_PORTAL_CACHE) > _IMAGE_PORTAL_CACHE_SIZE:
+            _IMAGE_PORTAL_CACHE.popitem(last=False)
+    return layer
+
+
+def _fill_cache_key(fill: Union[str, Image.Image]) -> tuple:
+    """Hashable key identifying the content of an image fill."""
+    if isinstance(fill, Image.Image):
+        digest = hashlib.blake2b(fill.tobytes(), digest_size=16)
+        # Palette images store indices only - the colors are in the palette
+        palette = fill.getpalette()
+        if palette is not None:
+            digest.update(bytes(palette))
+            digest.update(repr(fill.info.get("transparency")).encode())
+        return ("image", fill.mode, fill.size, digest.digest())
+    if isinstance(fill, str) and not fill.startswith(("http://", "https://")):
+        # Size as well as mtime, so a rewrite within one mtime tick is caught
+        stat = os.stat(fill)
+        return ("path", os.path.abspath(fill), stat.st_mtime_ns, stat.st_size)
+    return ("url", fill)
+
+
+@lru_cache(maxsize=32)
+def _render_gradient_portal_layer(
+    shape_path: str,
+    mtime: float,
+    size: Tuple[int, int],
+    gradient: PortalGradient
+) -> Tuple[Optional[Image.Image], Tuple[int, int]]:
+    """Gradient portal cropped to its shape. ``mtime`` is only part of the cache key."""
+    portal = _render_gradient_portal(shape_path, mtime, size, gradient)
+    return _crop_to_box(portal, _shape_bbox(shape_path, mtime, size))
+
+
+@lru_cache(maxsize=32)
+def _shape_bbox(
+    shape_path: str,
+    mtime: float,
+    size: Tuple[int, int]
+) -> Optional[Tuple[int, int, int, int]]:
+    """Bounding box of the non-transparent part of a shape mask."""
+    return _render_shape_mask(shape_path, mtime, size).getbbox()
 
-    return result
 
+def _crop_to_box(
+    img: Image.Image,
+    box: Optional[Tuple[int, int, int, int]]
+) -> Tuple[Optional[Image.Image], Tuple[int, int]]:
+    """Crop an image to box, returning the crop and its top-left corner."""
+    if box is None:
+        return None, (0, 0)
+    return img.crop(box), box[:2]
 
-def load_character_image(source) -> Image.Image:
-    """Load character image from URL, file path, or PIL Image."""
+
+def _apply_shape_mask(fill_img: Image.Image, shape_mask: Image.Image) -> Image.Image:
+    """Apply a shape mask as the alpha channel of a fill image (in place)."""
+    fill_img.putalpha(shape_mask)
+    return fill_img
+
+
+def _cover_size(image_size: Tuple[int, int], target_size: Tuple[int, int]) -> Tuple[int, int]:
+    """Size an image must be scaled to so it fully covers target_size."""
+    img_width, img_height = image_size
+    scale = max(target_size[0] / img_width, target_size[1] / img_height)
+    return int(img_width * scale), int(img_height * scale)
+
+
+def _rotation_transform(
+    size: Tuple[int, int],
+    angle: float
+) -> Tuple[Tuple[float, ...], Tuple[int, int]]:
+    """
+    Compute the affine data and canvas size of Image.rotate(angle, expand=True).
+
+    The returned coefficients map rotated-canvas pixels back to source pixels,
+    so they can be offset to sample any sub-region of the rotated image with
+    Image.transform.
+    """
+    width, height = size
+    center_x, center_y = width / 2, height / 2
+
+    radians = -math.radians(angle % 360.0)
+    a, b = round(math.cos(radians), 15), round(math.sin(radians), 15)
+    d, e = round(-math.sin(radians), 15), round(math.cos(radians), 15)
+
+    # Rotate around the image center
+    c = a * -center_x + b * -center_y + center_x
+    f = d * -center_x + e * -center_y + center_y
+
+    # Expand the canvas to fit the rotated corners
+    corners = [(a * x + b * y + c, d * x + e * y + f)
+               for x, y in ((0, 0), (width, 0), (width, height), (0, height))]
+    if angle % 90 == 0:
+        # Pillow transposes right angles instead; float error in the corners
+        # would otherwise add a row and column
+        new_width, new_height = (width, height) if angle % 180 == 0 else (height, width)
+    else:
+        new_width = math.ceil(max(x for x, _ in corners)) - math.floor(min(x for x, _ in corners))
+        new_height = math.ceil(max(y for _, y in corners)) - math.floor(min(y for _, y in corners))
+
+    shift_x, shift_y = -(new_width - width) / 2.0, -(new_height - height) / 2.0
+    c, f = a * shift_x + b * shift_y + c, d * shift_x + e * shift_y + f
+
+    return (a, b, c, d, e, f), (new_width, new_height)
+
+
+def _rotation_resample(rotation: Tuple[float, ...]) -> Image.Resampling:
+    """
+    Filter for sampling a _rotation_transform.
+
+    Right angles map pixels exactly onto pixels, so they are copied as-is
+    (like Pillow's transpose); other angles use BICUBIC.
+    """
+    if all(coef in (-1, 0, 1) for coef in (rotation[0], rotation[1], rotation[3], rotation[4])):
+        return Image.Resampling.NEAREST
+    return Image.Resampling.BICUBIC
+
+
+@lru_cache(maxsize=16)
+def _fetch_url(url: str) -> bytes:
+    """
+    Download a URL, caching the raw bytes.
+
+    Bytes rather than decoded images are cached so callers always get a
+    fresh, independently mutable image.
+    """
+    response = _SESSION.get(url, timeout=30)
+    response.raise_for_status()
+    return response.content
+
+
+def _decode_image(fp, target_size: Optional[Tuple[int, int]] = None) -> Image.Image:
+    """
+    Open and fully decode an image from a path or file object.
+
+    If target_size is given, JPEGs are decoded in draft mode at the
+    smallest scale that still covers target_size.
+    """
+    img = Image.open(fp)
+    if target_size is not None and img.format == "JPEG":
+        img.draft("RGB", _cover_size(img.size, target_size))
+    img.load()
+    return img
+
+
+def load_character_image(source, target_size: Optional[Tuple[int, int]] = None) -> Image.Image:
+    """Load character image from URL, file path, or PIL Image.
+
+    If target_size is given, JPEG sources are decoded at a reduced scale
+    (via Image.draft) that still covers target_size, skipping most of the
+    decode work for large photos.
+    """
     if isinstance(source, Image.Image):
         return source.convert("RGBA")
 
     if isinstance(source, str):
         if source.startswith(("http://", "https://")):
-            response = requests.get(source, timeout=30)
-            response.raise_for_status()
-            img = Image.open(BytesIO(response.content))
+            img = _decode_image(BytesIO(_fetch_url(source)), target_size)
         else:
-            img = Image.open(source)
-        return img.convert("RGBA")
+            img = _decode_image(source, target_size)
+        # The decoded image is ours - skip convert()'s copy if already RGBA
+        return img if img.mode == "RGBA" else img.convert("RGBA")
 
     raise ValueError(f"Unsupported source type: {type(source)}")
 
 
+def _intersect_boxes(*boxes: Tuple[int, int, int, int]) -> Optional[Tuple[int, int, int, int]]:
+    """Intersect (left, top, right, bottom) boxes. Returns None if they don't overlap."""
+    left = max(box[0] for box in boxes)
+    top = max(box[1] for box in boxes)
+    right = min(box[2] for box in boxes)
+    bottom = min(box[3] for box in boxes)
+    if left >= right or top >= bottom:
+        return None
+    return (left, top, right, bottom)
+
+
+def _get_buffer(mode: str, size: Tuple[int, int]) -> Image.Image:
+    """Take a cleared image from this thread's buffer pool, or allocate a new one."""
+    pool = _buffer_pool()
+    for i, img in enumerate(pool):
+        if img.mode == mode and img.size == size:
+            del pool[i]
+            img.paste(0, (0, 0) + img.size)
+            return img
+    return Image.new(mode, size, 0)
+
+
+def _release_buffer(img: Image.Image) -> None:
+    """Return an image obtained from _get_buffer to this thread's pool."""
+    pool = _buffer_pool()
+    pool.append(img)
+    del pool[:-_BUFFER_POOL_SIZE]
+
+
+def _buffer_pool() -> List[Image.Image]:
+    """This thread's list of pooled image buffers."""
+    if not hasattr(_BUFFER_POOL, "images"):
+        _BUFFER_POOL.images = []
+    return _BUFFER_POOL.images
+
+
+def _scratch_array(name: str, dtype, shape: Tuple[int, ...]) -> "np.ndarray":
+    """
+    A contiguous view of this thread's reusable scratch array called name.
+
+    The contents are undefined and are overwritten by the next call with the
+    same name, so results must be copied out (e.g. into an Image) before then.
+    """
+    if not hasattr(_BUFFER_POOL, "arrays"):
+        _BUFFER_POOL.arrays = {}
+    count = math.prod(shape)
+    buf = _BUFFER_POOL.arrays.get(name)
+    if buf is None or buf.dtype != dtype or buf.size < count:
+        buf = _BUFFER_POOL.arrays[name] = np.empty(count, dtype=dtype)
+    return buf[:count].reshape(shape)
+
+
+if HAS_NUMBA:
+    @numba.njit(parallel=True, cache=True)
+    def _mask_alpha_kernel(alpha, mask, out):
+        """out = alpha * mask // 255 on uint8 arrays, split across threads by row."""
+        height, width = alpha.shape
+        for y in numba.prange(height):
+            for x in range(width):
+                out[y, x] = (np.int32(alpha[y, x]) * np.int32(mask[y, x])) // 255
+
+
+def _downscale(canvas: Image.Image, internal_scale: float) -> Image.Image:
+    """
+    Downscale a canvas rendered at internal_scale back to output size.
+
+    Exact integer factors (2x, 3x, ...) are box-averaged with reduce(), about
+    5x cheaper than LANCZOS. This is not pixel-identical to LANCZOS: without
+    its sharpening, antialiased edges come out softer (up to ~45 levels on
+    edge pixels, under 1 on average for the sample characters). Other
+    factors keep LANCZOS.
+    """
+    factor = int(internal_scale)
+    if (factor >= 2 and factor == internal_scale
+            and canvas.width % factor == 0 and canvas.height % factor == 0):
+        return canvas.reduce(factor)
+
+    original_size = (
+        int(canvas.width / internal_scale),
+        int(canvas.height / internal_scale)
+    )
+    return canvas.resize(original_size, Image.Resampling.LANCZOS)
+
+
+def _prepare_character(
+    character_source,
+    config: AvatarConfig
+) -> Tuple[Image.Image, Optional[Tuple[float, ...]], Tuple[int, int]]:
+    """
+    Load and cover-scale the character for an already scaled config.
+
+    Returns:
+        The scaled character, the affine data of its rotation (None if not
+        rotated), and its size once rotated
+    """
+    # Load and prepare character image
+    character = load_character_image(character_source, config.character_size)
+
+    # Scale character using "cover" logic, cropping to target size in the same
+    # resampling pass by resizing only the visible window. The window sits on
+    # whole pixels of the cover-scaled image, as a resize-then-crop would cut
+    # it, and only the part of it that lies on the image is resampled - the
+    # truncated cover size can leave it a pixel short, which stays transparent.
+    target_width, target_height = config.character_size
+    img_width, img_height = character.size
+    new_width, new_height = _cover_size(character.size, config.character_size)
+    scale_x = new_width / img_width
+    scale_y = new_height / img_height
+
+    face_position = getattr(config, 'face_position', 0.0)
+    left = (new_width - target_width) // 2
+    top = int((new_height - target_height) * face_position)
+    x0, y0 = max(left, 0), max(top, 0)
+    x1 = min(left + target_width, new_width)
+    y1 = min(top + target_height, new_height)
+    visible = character.resize(
+        (x1 - x0, y1 - y0),
+        Image.Resampling.LANCZOS,
+        box=(x0 / scale_x, y0 / scale_y, min(x1 / scale_x, img_width), min(y1 / scale_y, img_height))
+    )
+    if visible.size == (target_width, target_height):
+        character = visible
+    else:
+        character = Image.new("RGBA", (target_width, target_height), (0, 0, 0, 0))
+        character.paste(visible, (x0 - left, y0 - top))
+
+    # Work out rotation if specified (applied later, only on the visible region)
+    rotation = None
+    rotated_size = character.size
+    angle = getattr(config, 'character_rotation', 0.0)
+    if abs(angle) >= _MIN_ROTATION:
+        rotation, rotated_size = _rotation_transform(character.size, angle)
+
+    return character, rotation, rotated_size
+
+
+def _mask_character(
+    character: Image.Image,
+    rotation: Optional[Tuple[float, ...]],
+    rotated_size: Tuple[int, int],
+    mask: Image.Image,
+    config: AvatarConfig
+) -> Optional[Tuple[Image.Image, Tuple[int, int]]]:
+    """
+    Rotate, position and clip a prepared character with the mask shape.
+
+    The result doesn't depend on the portal fill, so batches compute it once.
+    mask is only read, so the shared cached mask can be passed in.
+
+    Returns:
+        The masked character cropped to its visible region and the canvas
+        position to composite it at, or None if nothing is visible
+    """
+    # Work only on the region where character, mask and canvas overlap
+    char_x, char_y = config.character_offset
+    mask_x, mask_y = config.mask_offset
+    region = _intersect_boxes(
+        (char_x, char_y, char_x + rotated_size[0], char_y + rotated_size[1]),
+        (mask_x, mask_y, mask_x + mask.width, mask_y + mask.height),
+        (0, 0) + tuple(config.output_size),
+    )
+    if region is None:
+        return None
+
+    left, top, right, bottom = region
+    if rotation is None:
+        char_crop = character.crop((left - char_x, top - char_y, right - char_x, bottom - char_y))
+    else:
+        # Rotate and position in one resampling pass, straight into the region
+        a, b, c, d, e, f = rotation
+        dx, dy = left - char_x, top - char_y
+        char_crop = character.transform(
+            (right - left, bottom - top),
+            Image.Transform.AFFINE,
+            (a, b, c + a * dx + b * dy, d, e, f + d * dx + e * dy),
+            resample=_rotation_resample(rotation)
+        )
+    mask_crop = mask.crop((left - mask_x, top - mask_y, right - mask_x, bottom - mask_y))
+
+    # Combine character alpha with mask
+    if not HAS_NUMPY:
+        char_crop.putalpha(ImageChops.multiply(char_crop.getchannel("A"), mask_crop))
+        return char_crop, (left, top)
+
+    # Same a * b / 255 as ImageChops.multiply; only the alpha band goes
+    # through NumPy, the RGB bands never leave Pillow. The arithmetic runs in
+    # per-thread scratch arrays, and putalpha copies the result out of them.
+    char_alpha = np.asarray(char_crop.getchannel("A"))
+    mask_alpha = np.asarray(mask_crop)
+    final_alpha = _scratch_array("alpha", np.uint8, char_alpha.shape)
+    if HAS_NUMBA:
+        _mask_alpha_kernel(char_alpha, mask_alpha, final_alpha)
+    else:
+        product = _scratch_array("alpha_product", np.uint16, char_alpha.shape)
+        np.multiply(char_alpha, mask_alpha, out=product, dtype=np.uint16)
+        np.floor_divide(product, 255, out=final_alpha, casting="unsafe")
+    char_crop.putalpha(Image.fromarray(final_alpha, "L"))
+
+    return char_crop, (left, top)
+
+
 def composite_avatar(
     character_source,
     fill: Union[PortalGradient, str, Image.Image] = None,
@@ -341,111 +1060,92 @@ def composite_avatar(
     Returns:
         RGBA image of the complete avatar
     """
-    if config is None:
-        config = AvatarConfig()
-
-    # Apply scaling
-    config = config.scaled()
-
     if fill is None:
         fill = PortalGradient.orange()
 
-    if portal_shape is None:
-        portal_shape = os.path.join(SCRIPT_DIR, "portal_shape.svg")
-    if mask_shape is None:
-        mask_shape = os.path.join(SCRIPT_DIR, "mask_shape.svg")
-
-    # Create the base canvas
-    canvas = Image.new("RGBA", config.output_size, (0, 0, 0, 0))
-
-    # 1. Create portal with fill (gradient or image)
-    portal_img = create_portal_with_fill(portal_shape, config.portal_size, fill)
-
-    # Paste portal onto canvas
-    canvas.paste(portal_img, config.portal_offset, portal_img)
-
-    # 2. Load and prepare character image
-    character = load_character_image(character_source)
+    return composite_avatar_batch(
+        character_source, [fill], config=config,
+        portal_shape=portal_shape, mask_shape=mask_shape
+    )[0]
 
-    # Scale character using "cover" logic
-    target_width, target_height = config.character_size
-    img_width, img_height = character.size
 
-    scale = max(target_width / img_width, target_height / img_height)
-    new_width = int(img_width * scale)
-    new_height = int(img_height * scale)
-    character = character.resize((new_width, new_height), Image.Resampling.LANCZOS)
+def composite_avatar_batch(
+    character_source,
+    fills: List[Union[PortalGradient, str, Image.Image]],
+    config: AvatarConfig = None,
+    portal_shape: str = None,
+    mask_shape: str = None
+) -> List[Image.Image]:
+    """
+    Composite one character onto several portal fills.
 
-    # Crop to target size
-    face_position = getattr(config, 'face_position', 0.0)
-    left = (new_width - target_width) // 2
-    max_top = new_height - target_height
-    top = int(max_top * face_position)
-    character = character.crop((left, top, left + target_width, top + target_height))
-
-    # Apply rotation if specified
-    if hasattr(config, 'character_rotation') and config.character_rotation != 0:
-        character = character.rotate(
-            config.character_rotation,
-            expand=True,
-            resample=Image.Resampling.BICUBIC
-        )
+    The character is loaded, scaled, rotated and masked once; only the
+    portal is rendered for each fill.
 
-    # 3. Load mask shape
-    mask = load_shape_mask(mask_shape, config.mask_size)
+    Args:
+        character_source: URL, file path, or PIL Image of character
+        fills: PortalGradients and/or paths/Images, one per avatar
+        config: AvatarConfig for customization
+        portal_shape: Path to portal shape file (PNG or SVG)
+        mask_shape: Path to mask shape file (PNG or SVG)
 
-    # 4. Create expanded work area for negative offsets
-    expand_left = abs(min(0, config.mask_offset[0], config.character_offset[0]))
-    expand_top = abs(min(0, config.mask_offset[1], config.character_offset[1]))
-    expanded_size = (
-        config.output_size[0] + expand_left * 2 + 200,
-        config.output_size[1] + expand_top * 2 + 200
-    )
+    Returns:
+        RGBA avatar images, in the same order as fills
+    """
+    if config is None:
+        config = AvatarConfig()
 
-    # Position character on expanded canvas
-    char_x = expand_left + config.character_offset[0]
-    char_y = expand_top + config.character_offset[1]
+    # Apply scaling
+    config = config.scaled()
 
-    # Position mask on expanded canvas
-    mask_x = expand_left + config.mask_offset[0]
-    mask_y = expand_top + config.mask_offset[1]
+    if portal_shape is None:
+        portal_shape = os.path.join(SCRIPT_DIR, "portal_shape.svg")
+    if mask_shape is None:
+        mask_shape = os.path.join(SCRIPT_DIR, "mask_shape.svg")
 
-    # Create full-size mask
-    full_mask = Image.new("L", expanded_size, 0)
-    full_mask.paste(mask, (mask_x, mask_y))
+    # 1. Start rendering mask shape and portals (gradient or image fill) in the background
+    mask_future = _EXECUTOR.submit(_shared_shape_mask, mask_shape, config.mask_size)
+    portal_futures = [
+        _EXECUTOR.submit(_portal_layer, portal_shape, config.portal_size, fill)
+        for fill in fills
+    ]
+
+    # 2. Prepare the masked character layer shared by all fills
+    character, rotation, rotated_size = _prepare_character(character_source, config)
+    char_layer = _mask_character(character, rotation, rotated_size, mask_future.result(), config)
+
+    # Supersampled canvases are discarded after downscaling, so reuse them
+    supersampled = hasattr(config, '_internal_scale') and config._internal_scale > 1.0
+
+    avatars = []
+    for portal_future in portal_futures:
+        # 3. Create the base canvas and paste the visible part of the portal onto it
+        portal_img, (portal_x, portal_y) = portal_future.result()
+        if supersampled:
+            canvas = _get_buffer("RGBA", config.output_size)
+        else:
+            canvas = Image.new("RGBA", config.output_size, (0, 0, 0, 0))
 
-    # Create character on expanded canvas
-    temp = Image.new("RGBA", expanded_size, (0, 0, 0, 0))
-    temp.paste(character, (char_x, char_y))
+        try:
+            if portal_img is not None:
+                portal_pos = (config.portal_offset[0] + portal_x, config.portal_offset[1] + portal_y)
+                canvas.paste(portal_img, portal_pos, portal_img)
 
-    # Get character's original alpha
-    char_orig_alpha = temp.getchannel("A")
+            # 4. Composite masked character onto canvas
+            if char_layer is not None:
+                char_img, char_dest = char_layer
+                canvas.alpha_composite(char_img, dest=char_dest)
 
-    # Combine character alpha with mask
-    final_alpha = ImageChops.multiply(char_orig_alpha, full_mask)
-
-    # Apply combined alpha
-    char_expanded = temp.copy()
-    char_expanded.putalpha(final_alpha)
-
-    # Crop back to output size
-    crop_box = (expand_left, expand_top,
-                expand_left + config.output_size[0],
-                expand_top + config.output_size[1])
-    char_layer = char_expanded.crop(crop_box)
-
-    # 5. Composite masked character onto canvas
-    canvas = Image.alpha_composite(canvas, char_layer)
-
-    # 6. Downscale if we rendered at higher resolution for sub-pixel precision
-    if hasattr(config, '_internal_scale') and config._internal_scale > 1.0:
-        original_size = (
-            int(canvas.width / config._internal_scale),
-            int(canvas.height / config._internal_scale)
-        )
-        canvas = canvas.resize(original_size, Image.Resampling.LANCZOS)
+            # 5. Downscale if we rendered at higher resolution for sub-pixel precision
+            if supersampled:
+                avatars.append(_downscale(canvas, config._internal_scale))
+            else:
+                avatars.append(canvas)
+        finally:
+            if supersampled:
+                _release_buffer(canvas)
 
-    return canvas
+    return avatars
 
 
 if __name__ == "__main__":
@@ -476,18 +1176,21 @@ if __name__ == "__main__":
         if scale_idx + 1 < len(sys.argv):
             config.output_scale = float(sys.argv[scale_idx + 1])
 
-    # Create avatar
-    avatar = composite_avatar(character_source=character_path, fill=fill, config=config)
-    avatar.save(output_path, "PNG")
-    print(f"Avatar saved to {output_path} (size: {avatar.size[0]}x{avatar.size[1]})")
-
-    # Create gradient variants
-    for name, gradient in [
+    # Create avatar plus gradient variants, sharing the character preparation
+    variants = [
         ("blue", PortalGradient.blue()),
         ("green", PortalGradient.green()),
         ("purple", PortalGradient.purple()),
-    ]:
-        variant = composite_avatar(character_source=character_path, fill=gradient, config=config)
+    ]
+    avatar, *variant_avatars = composite_avatar_batch(
+        character_source=character_path,
+        fills=[fill] + [gradient for _, gradient in variants],
+        config=config
+    )
+    avatar.save(output_path, "PNG")
+    print(f"Avatar saved to {output_path} (size: {avatar.size[0]}x{avatar.size[1]})")
+
+    for (name, _), variant in zip(variants, variant_avatars):
         variant_path = output_path.replace(".png", f"_{name}.png")
         variant.save(variant_path, "PNG")
         print(f"Variant saved to {variant_path}")
@@ -7,5 +7,5 @@ if [ ! -d ".venv" ]; then
 fi
 
 # Install deps and run
-.venv/bin/pip install -q Pillow requests cairosvg
+.venv/bin/pip install -q Pillow numpy requests cairosvg
 .venv/bin/python avatar_compositor.py "$@"
@@ -7,5 +7,5 @@ if [ ! -d ".venv" ]; then
 fi
 
 # Install deps and run UI
-.venv/bin/pip install -q Pillow requests cairosvg gradio
+.venv/bin/pip install -q Pillow numpy requests cairosvg gradio
 .venv/bin/python ui.py
@@ -0,0 +1,48 @@
+import json
+import os
+import sys
+
+import pytest
+from PIL import Image, ImageDraw
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+SAMPLE_DIR = os.path.join(REPO_ROOT, "Sample Characters")
+
+# Sample character file -> key in bounding-boxes.json
+SAMPLE_CHARACTERS = {
+    "Fox.png": "fox",
+    "Frankie.png": "frankie",
+    "Kirby.webp": "kirby",
+    "Trainer Rex.png": "Trainer Rex",
+}
+
+
+def sample_path(name):
+    return os.path.join(SAMPLE_DIR, name)
+
+
+def head_bbox(name):
+    with open(os.path.join(REPO_ROOT, "bounding-boxes.json")) as f:
+        return json.load(f)[SAMPLE_CHARACTERS[name]]["bbox"]
+
+
+@pytest.fixture(scope="session")
+def png_shapes(tmp_path_factory):
+    """PNG stand-ins for the bundled SVG shapes, so tests don't need cairosvg."""
+    shape_dir = tmp_path_factory.mktemp("shapes")
+
+    portal = Image.new("RGBA", (460, 508), (0, 0, 0, 0))
+    ImageDraw.Draw(portal).ellipse((10, 20, 450, 500), fill=(0, 0, 0, 255))
+    portal_path = str(shape_dir / "portal.png")
+    portal.save(portal_path)
+
+    mask = Image.new("RGBA", (460, 640), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(mask)
+    draw.rectangle((0, 0, 459, 300), fill=(0, 0, 0, 255))
+    draw.ellipse((0, 100, 459, 630), fill=(0, 0, 0, 255))
+    mask_path = str(shape_dir / "mask.png")
+    mask.save(mask_path)
+
+    return portal_path, mask_path
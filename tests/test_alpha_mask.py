@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+numba = pytest.importorskip("numba")
+
+import avatar_compositor as ac  # noqa: E402
+from conftest import sample_path  # noqa: E402
+
+
+@pytest.mark.parametrize("shape", [(1, 1), (7, 513), (640, 460)])
+def test_numba_kernel_matches_numpy(shape):
+    rng = np.random.default_rng(0)
+    alpha = rng.integers(0, 256, shape, dtype=np.uint8)
+    mask = rng.integers(0, 256, shape, dtype=np.uint8)
+    out = np.empty(shape, dtype=np.uint8)
+
+    ac._mask_alpha_kernel(alpha, mask, out)
+    expected = (alpha.astype(np.uint16) * mask // 255).astype(np.uint8)
+    assert out.tobytes() == expected.tobytes()
+
+
+def test_numba_kernel_every_value_pair():
+    alpha, mask = (a.astype(np.uint8) for a in np.indices((256, 256)))
+    out = np.empty((256, 256), dtype=np.uint8)
+
+    ac._mask_alpha_kernel(alpha, mask, out)
+    assert out.tobytes() == (alpha.astype(np.uint16) * mask // 255).astype(np.uint8).tobytes()
+
+
+@pytest.mark.skipif(not ac.HAS_NUMBA, reason="numba path disabled")
+def test_composite_same_with_and_without_numba(png_shapes, monkeypatch):
+    portal_shape, mask_shape = png_shapes
+    config = ac.AvatarConfig(character_rotation=-7.5)
+    expected = ac.composite_avatar(
+        sample_path("Fox.png"), ac.ORANGE, config, portal_shape=portal_shape, mask_shape=mask_shape
+    )
+    monkeypatch.setattr(ac, "HAS_NUMBA", False)
+    actual = ac.composite_avatar(
+        sample_path("Fox.png"), ac.ORANGE, config, portal_shape=portal_shape, mask_shape=mask_shape
+    )
+    assert actual.tobytes() == expected.tobytes()
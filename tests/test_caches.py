@@ -0,0 +1,109 @@
+import os
+
+from PIL import Image, ImageDraw
+
+import avatar_compositor as ac
+
+
+def _save_shape(path, box, mtime):
+    shape = Image.new("L", (100, 100), 0)
+    ImageDraw.Draw(shape).rectangle(box, fill=255)
+    shape.save(path)
+    os.utime(path, (mtime, mtime))
+
+
+def test_shape_mask_reloads_when_file_changes(tmp_path):
+    path = str(tmp_path / "shape.png")
+    _save_shape(path, (0, 0, 49, 99), mtime=1_000_000)
+    assert ac.load_shape_mask(path, (100, 100)).getbbox() == (0, 0, 50, 100)
+
+    _save_shape(path, (50, 0, 99, 99), mtime=1_000_010)
+    assert ac.load_shape_mask(path, (100, 100)).getbbox() == (50, 0, 100, 100)
+
+
+def test_load_shape_mask_returns_private_copy(tmp_path):
+    path = str(tmp_path / "shape.png")
+    _save_shape(path, (0, 0, 49, 99), mtime=1_000_000)
+    ac.load_shape_mask(path, (100, 100)).paste(0, (0, 0, 100, 100))
+    assert ac.load_shape_mask(path, (100, 100)).getbbox() == (0, 0, 50, 100)
+
+
+def test_gradient_portal_reloads_when_shape_changes(tmp_path):
+    path = str(tmp_path / "shape.png")
+    _save_shape(path, (0, 0, 49, 99), mtime=1_000_000)
+    portal, origin = ac._portal_layer(path, (100, 100), ac.ORANGE)
+    assert (origin, portal.size) == ((0, 0), (50, 100))
+
+    _save_shape(path, (50, 0, 99, 99), mtime=1_000_010)
+    portal, origin = ac._portal_layer(path, (100, 100), ac.ORANGE)
+    assert (origin, portal.size) == ((50, 0), (50, 100))
+
+
+def test_image_portal_reloads_when_shape_changes(tmp_path):
+    path = str(tmp_path / "shape.png")
+    fill = Image.new("RGB", (64, 64), (10, 200, 30))
+    _save_shape(path, (0, 0, 49, 99), mtime=1_000_000)
+    assert ac._portal_layer(path, (100, 100), fill)[1] == (0, 0)
+
+    _save_shape(path, (50, 0, 99, 99), mtime=1_000_010)
+    assert ac._portal_layer(path, (100, 100), fill)[1] == (50, 0)
+
+
+def test_image_portal_follows_fill_content(tmp_path):
+    path = str(tmp_path / "shape.png")
+    _save_shape(path, (0, 0, 99, 99), mtime=1_000_000)
+
+    # Same PIL image edited in place
+    fill = Image.new("RGB", (64, 64), (10, 200, 30))
+    assert ac._portal_layer(path, (100, 100), fill)[0].getpixel((50, 50)) == (10, 200, 30, 255)
+    fill.paste((200, 10, 30), (0, 0, 64, 64))
+    assert ac._portal_layer(path, (100, 100), fill)[0].getpixel((50, 50)) == (200, 10, 30, 255)
+
+    # Fill file rewritten on disk
+    fill_path = str(tmp_path / "fill.png")
+    Image.new("RGB", (64, 64), (1, 2, 3)).save(fill_path)
+    os.utime(fill_path, (1_000_000, 1_000_000))
+    assert ac._portal_layer(path, (100, 100), fill_path)[0].getpixel((50, 50)) == (1, 2, 3, 255)
+    Image.new("RGB", (64, 64), (4, 5, 6)).save(fill_path)
+    os.utime(fill_path, (1_000_010, 1_000_010))
+    assert ac._portal_layer(path, (100, 100), fill_path)[0].getpixel((50, 50)) == (4, 5, 6, 255)
+
+
+def test_image_portal_follows_fill_palette(tmp_path):
+    path = str(tmp_path / "shape.png")
+    _save_shape(path, (0, 0, 99, 99), mtime=1_000_000)
+
+    # Same palette indices, different palettes
+    red = Image.new("P", (64, 64), 0)
+    red.putpalette([255, 0, 0] + [0, 0, 0] * 255)
+    blue = Image.new("P", (64, 64), 0)
+    blue.putpalette([0, 0, 255] + [0, 0, 0] * 255)
+    assert red.tobytes() == blue.tobytes()
+
+    assert ac._portal_layer(path, (100, 100), red)[0].getpixel((50, 50)) == (255, 0, 0, 255)
+    assert ac._portal_layer(path, (100, 100), blue)[0].getpixel((50, 50)) == (0, 0, 255, 255)
+
+
+def test_image_portal_follows_fill_file_size_within_mtime(tmp_path):
+    path = str(tmp_path / "shape.png")
+    _save_shape(path, (0, 0, 99, 99), mtime=1_000_000)
+
+    # Rewritten with a different size but the same mtime
+    fill_path = str(tmp_path / "fill.png")
+    Image.new("RGB", (64, 64), (1, 2, 3)).save(fill_path)
+    os.utime(fill_path, (1_000_000, 1_000_000))
+    assert ac._portal_layer(path, (100, 100), fill_path)[0].getpixel((50, 50)) == (1, 2, 3, 255)
+    Image.new("RGB", (80, 80), (4, 5, 6)).save(fill_path)
+    os.utime(fill_path, (1_000_000, 1_000_000))
+    assert ac._portal_layer(path, (100, 100), fill_path)[0].getpixel((50, 50)) == (4, 5, 6, 255)
+
+
+def test_gradient_portal_held_once(tmp_path):
+    path = str(tmp_path / "shape.png")
+    _save_shape(path, (0, 0, 49, 99), mtime=1_000_000)
+
+    # Only the cropped layer is cached; full portals are rendered per call
+    assert not hasattr(ac._render_gradient_portal, "cache_info")
+    portal = ac.create_portal_with_fill(path, (100, 100), ac.ORANGE)
+    portal.paste((0, 0, 0, 0), (0, 0, 100, 100))
+    assert ac.create_portal_with_fill(path, (100, 100), ac.ORANGE).getbbox() == (0, 0, 50, 100)
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+import avatar_compositor as ac
+from conftest import SAMPLE_CHARACTERS, sample_path
+
+
+def _resize_then_crop(character, config):
+    """The original cover scaling: resize the whole character, then crop on whole pixels."""
+    target_width, target_height = config.character_size
+    new_size = ac._cover_size(character.size, config.character_size)
+    character = character.resize(new_size, Image.Resampling.LANCZOS)
+    left = (new_size[0] - target_width) // 2
+    top = int((new_size[1] - target_height) * config.face_position)
+    return character.crop((left, top, left + target_width, top + target_height))
+
+
+def _assert_matches_resize_then_crop(source, config):
+    actual, _, _ = ac._prepare_character(source, config)
+    expected = _resize_then_crop(ac.load_character_image(source), config)
+    assert actual.size == expected.size
+
+    # Same framing; the box resize's float coordinates can round a few
+    # antialiased pixels differently, by 1 LSB of alpha
+    actual = np.asarray(actual, dtype=int)
+    expected = np.asarray(expected, dtype=int)
+    alpha_diff = np.abs(actual[..., 3] - expected[..., 3])
+    assert alpha_diff.max() <= 1
+    assert (alpha_diff > 0).mean() < 1e-4
+    premultiplied = actual[..., :3] * actual[..., 3:] - expected[..., :3] * expected[..., 3:]
+    assert np.abs(premultiplied).max() <= 2 * 255
+
+
+@pytest.mark.parametrize("name", sorted(SAMPLE_CHARACTERS))
+@pytest.mark.parametrize("config", [
+    ac.AvatarConfig(),
+    ac.AvatarConfig(output_scale=2.0),
+    ac.AvatarConfig(output_scale=0.5),
+    ac.AvatarConfig(character_size=(408, 731), face_position=0.4),
+], ids=["default", "default_2x", "half_scale", "ui_base"])
+def test_cover_crop_matches_resize_then_crop(name, config):
+    _assert_matches_resize_then_crop(sample_path(name), config.scaled())
+
+
+@pytest.mark.parametrize("face_position", [0.0, 0.5, 1.0])
+def test_cover_crop_short_by_truncation(face_position):
+    # 90x107 covers 100x120 at 100x119 once truncated - the crop leaves the
+    # missing row transparent rather than failing
+    character = Image.new("RGBA", (90, 107), (10, 200, 30, 255))
+    config = ac.AvatarConfig(character_size=(100, 120), face_position=face_position)
+    assert ac._cover_size(character.size, config.character_size) == (100, 119)
+    _assert_matches_resize_then_crop(character, config)
+
+    prepared, _, _ = ac._prepare_character(character, config)
+    bbox = prepared.getchannel("A").getbbox()
+    assert (bbox[0], bbox[2], bbox[3] - bbox[1]) == (0, 100, 119)
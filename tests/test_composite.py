@@ -0,0 +1,120 @@
+import pytest
+from PIL import Image
+
+import avatar_compositor as ac
+from conftest import SAMPLE_CHARACTERS, head_bbox, sample_path
+
+
+def _configs(name):
+    size = Image.open(sample_path(name)).size
+    return {
+        "default": ac.AvatarConfig(),
+        "default_2x": ac.AvatarConfig(output_scale=2.0),
+        # ui.py's base character size, and its character scale slider
+        "ui_base": ac.AvatarConfig(character_size=(408, 731)),
+        "ui_scale_1.95": ac.AvatarConfig(character_size=(int(408 * 1.95), int(731 * 1.95))),
+        "ui_scale_2.65": ac.AvatarConfig(character_size=(int(408 * 2.65), int(731 * 2.65))),
+        "auto": ac.compute_auto_config(size, head_bbox(name)),
+        "auto_2x": ac.compute_auto_config(size, head_bbox(name), output_scale=2.0),
+    }
+
+
+@pytest.mark.parametrize("name", sorted(SAMPLE_CHARACTERS))
+def test_sample_characters_composite(name, png_shapes):
+    portal_shape, mask_shape = png_shapes
+    for label, config in _configs(name).items():
+        avatar = ac.composite_avatar(
+            sample_path(name), ac.ORANGE, config,
+            portal_shape=portal_shape, mask_shape=mask_shape
+        )
+        assert avatar.mode == "RGBA", label
+        expected = tuple(int(d * config.output_scale) for d in config.output_size)
+        assert avatar.size == expected, label
+        assert avatar.getchannel("A").getbbox() is not None, label
+
+
+@pytest.mark.skipif(not ac.HAS_CAIROSVG, reason="cairosvg not installed")
+@pytest.mark.parametrize("name", sorted(SAMPLE_CHARACTERS))
+def test_sample_characters_bundled_shapes(name):
+    for label, config in _configs(name).items():
+        avatar = ac.composite_avatar(sample_path(name), ac.ORANGE, config)
+        assert avatar.getchannel("A").getbbox() is not None, label
+
+
+@pytest.mark.parametrize("fill_size", [(11, 11), (13, 26), (1439, 1333)])
+def test_image_fill_covering_whole_portal(fill_size, png_shapes, tmp_path):
+    # A shape that reaches every edge makes the fill window span the whole fill
+    full_shape = str(tmp_path / "full.png")
+    Image.new("L", (200, 200), 255).save(full_shape)
+    fill = Image.new("RGB", fill_size, (10, 200, 30))
+    avatar = ac.composite_avatar(
+        sample_path("Fox.png"), fill, ac.AvatarConfig(),
+        portal_shape=full_shape, mask_shape=png_shapes[1]
+    )
+    assert avatar.getpixel((0, avatar.height - 1)) == (10, 200, 30, 255)
+
+
+@pytest.mark.parametrize("config", [
+    ac.AvatarConfig(),
+    ac.AvatarConfig(character_rotation=0.0, mask_offset=(0, -30)),
+    ac.AvatarConfig(character_rotation=-7.5, output_scale=0.5),
+    ac.AvatarConfig(character_rotation=90.0, character_size=(400, 300)),
+], ids=["default", "no_rotation", "half_scale", "right_angle"])
+def test_batch_matches_single_composites(config, png_shapes):
+    portal_shape, mask_shape = png_shapes
+    fills = [
+        ac.ORANGE,
+        ac.PortalGradient("#2D7ECE", "#CE2D2D", axis="vertical"),
+        Image.open(sample_path("Frankie.png")).convert("RGB"),
+    ]
+    batch = ac.composite_avatar_batch(
+        sample_path("Fox.png"), fills, config,
+        portal_shape=portal_shape, mask_shape=mask_shape
+    )
+    assert len(batch) == len(fills)
+    for fill, avatar in zip(fills, batch):
+        single = ac.composite_avatar(
+            sample_path("Fox.png"), fill, config,
+            portal_shape=portal_shape, mask_shape=mask_shape
+        )
+        assert avatar.size == single.size
+        assert avatar.tobytes() == single.tobytes()
+
+
+
+@pytest.fixture
+def fresh_gradient_caches():
+    """Keep gradient portals rendered by one backend out of other tests."""
+    ac._render_gradient_portal_layer.cache_clear()
+    yield
+    ac._render_gradient_portal_layer.cache_clear()
+
+
+def _premultiplied(image):
+    import numpy as np
+
+    rgba = np.asarray(image, dtype=float)
+    return np.concatenate([rgba[..., :3] * rgba[..., 3:] / 255, rgba[..., 3:]], axis=-1)
+
+
+@pytest.mark.skipif(not ac.HAS_NUMPY, reason="NumPy not installed")
+@pytest.mark.parametrize("name", sorted(SAMPLE_CHARACTERS))
+def test_pure_pillow_fallback_matches_numpy(name, png_shapes, monkeypatch, fresh_gradient_caches):
+    import numpy as np
+
+    portal_shape, mask_shape = png_shapes
+    config = ac.AvatarConfig(character_rotation=-7.5)
+    expected = ac.composite_avatar(
+        sample_path(name), ac.ORANGE, config, portal_shape=portal_shape, mask_shape=mask_shape
+    )
+
+    monkeypatch.setattr(ac, "HAS_NUMPY", False)
+    monkeypatch.setattr(ac, "HAS_NUMBA", False)
+    ac._render_gradient_portal_layer.cache_clear()
+    actual = ac.composite_avatar(
+        sample_path(name), ac.ORANGE, config, portal_shape=portal_shape, mask_shape=mask_shape
+    )
+
+    # The gradients differ by at most 1 LSB; compositing and the 2x downscale
+    # can round that to 2 at the portal's antialiased edge
+    assert np.abs(_premultiplied(actual) - _premultiplied(expected)).max() <= 2
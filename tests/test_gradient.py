@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+import avatar_compositor as ac
+
+GRADIENTS = [("#CE782D", "#E1A371"), ("#000000", "#FFFFFF"), ("#2D7ECE", "#CE2D2D")]
+SIZES = [(340, 340), (680, 682), (1, 1), (3, 500), (500, 3)]
+
+
+@pytest.mark.skipif(not ac.HAS_NUMPY, reason="NumPy not installed")
+@pytest.mark.parametrize("axis", ac.GRADIENT_AXES)
+@pytest.mark.parametrize("colors", GRADIENTS)
+def test_pillow_gradient_matches_numpy(axis, colors):
+    gradient = ac.PortalGradient(*colors, axis=axis)
+    for size in SIZES:
+        expected = np.asarray(ac.create_gradient_image(size, gradient), dtype=int)
+        actual = np.asarray(ac._create_gradient_image_pil(size, gradient), dtype=int)
+        assert actual.shape == expected.shape
+        assert np.abs(actual - expected).max() <= 1, size
+
+
+@pytest.mark.parametrize("axis", ac.GRADIENT_AXES)
+def test_gradient_endpoints(axis, monkeypatch):
+    gradient = ac.PortalGradient("#000000", "#FFFFFF", axis=axis)
+    # (start, end) pixels: top-right to bottom-left, top to bottom, right to left
+    corners = {
+        "diagonal": ((99, 0), (0, 99)),
+        "vertical": ((50, 0), (50, 99)),
+        "horizontal": ((99, 50), (0, 50)),
+    }[axis]
+    for has_numpy in (True, False) if ac.HAS_NUMPY else (False,):
+        monkeypatch.setattr(ac, "HAS_NUMPY", has_numpy)
+        image = ac.create_gradient_image((100, 100), gradient)
+        start, end = (image.getpixel(corner)[0] for corner in corners)
+        assert start <= 3 and end >= 252, has_numpy
+
+
+def test_solid_gradient_is_flat():
+    image = ac.create_gradient_image((40, 30), ac.PortalGradient("#123456", "#123456"))
+    assert image.getcolors() == [(40 * 30, (0x12, 0x34, 0x56))]
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+import avatar_compositor as ac
+
+ANGLES = [3.0, -7.5, 0.05, 12.345, 45.0, 90.0, -90.0, 180.0, 270.0, 359.9]
+SIZES = [(449, 804), (100, 57), (341, 340), (2, 3), (1, 1)]
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_rotation_transform_matches_rotate_expand(size):
+    rng = np.random.default_rng(0)
+    image = Image.fromarray(rng.integers(0, 256, (size[1], size[0], 4), dtype=np.uint8), "RGBA")
+    for angle in ANGLES:
+        expected = image.rotate(angle, Image.Resampling.BICUBIC, expand=True)
+        data, rotated_size = ac._rotation_transform(image.size, angle)
+        actual = image.transform(
+            rotated_size, Image.Transform.AFFINE, data, resample=ac._rotation_resample(data)
+        )
+        assert actual.size == expected.size, angle
+        assert actual.tobytes() == expected.tobytes(), angle
+
+
+def test_small_rotation_is_skipped():
+    character = Image.new("RGBA", (449, 804), (255, 0, 0, 255))
+    for angle in (0.0, 0.01, -0.049):
+        _, rotation, rotated_size = ac._prepare_character(character, ac.AvatarConfig(character_rotation=angle))
+        assert rotation is None and rotated_size == (449, 804)
+    _, rotation, _ = ac._prepare_character(character, ac.AvatarConfig(character_rotation=0.05))
+    assert rotation is not None
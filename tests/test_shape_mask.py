@@ -0,0 +1,86 @@
+import math
+import os
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import avatar_compositor as ac
+from conftest import REPO_ROOT
+
+SIZES = [(340, 340), (170, 170), (339, 341), (340, 430), (101, 257)]
+
+# Tolerances for a master resized into place vs rendering straight at size:
+# the shape may not move by more than MAX_SHIFT px, and only resampling
+# differences at the antialiased edge are allowed
+MAX_SHIFT = 0.05
+MAX_MEAN_DIFF = 0.5
+MAX_EDGE_DIFF = 32  # 99.9th percentile
+
+
+def _ellipse(size, box, supersample=8):
+    """Exact-coverage antialiased ellipse filling box (float pixel bounds)."""
+    x0, y0, x1, y1 = box
+    cx, cy, rx, ry = (x0 + x1) / 2, (y0 + y1) / 2, (x1 - x0) / 2, (y1 - y0) / 2
+    xs = (np.arange(size[0] * supersample) + 0.5) / supersample
+    ys = (np.arange(size[1] * supersample) + 0.5) / supersample
+    inside = ((xs[None, :] - cx) / rx) ** 2 + ((ys[:, None] - cy) / ry) ** 2 <= 1
+    coverage = inside.reshape(size[1], supersample, size[0], supersample).mean(axis=(1, 3))
+    return Image.fromarray(np.round(coverage * 255).astype(np.uint8), "L")
+
+
+def _assert_masks_match(actual, expected):
+    actual = np.asarray(actual, dtype=float)
+    expected = np.asarray(expected, dtype=float)
+    assert actual.shape == expected.shape
+
+    ys, xs = np.indices(actual.shape)
+    for coords in (xs, ys):
+        shift = (coords * actual).sum() / actual.sum() - (coords * expected).sum() / expected.sum()
+        assert abs(shift) <= MAX_SHIFT
+
+    diff = np.abs(actual - expected)
+    assert diff.mean() <= MAX_MEAN_DIFF
+    assert np.percentile(diff, 99.9) <= MAX_EDGE_DIFF
+
+
+@pytest.mark.parametrize("viewbox", [(115, 127), (115, 160)])
+@pytest.mark.parametrize("size", SIZES)
+def test_fit_master_places_shape_like_meet(viewbox, size):
+    # A master raster as cairosvg would produce it: content at the exact
+    # viewBox scale, canvas truncated to whole pixels
+    extent = (ac._SVG_MASTER_WIDTH, ac._SVG_MASTER_WIDTH * viewbox[1] / viewbox[0])
+    master = _ellipse((extent[0], math.floor(extent[1])), (0, 0) + extent, supersample=4)
+
+    scale = min(size[0] / viewbox[0], size[1] / viewbox[1])
+    left = (size[0] - viewbox[0] * scale) / 2
+    top = (size[1] - viewbox[1] * scale) / 2
+    expected = _ellipse(size, (left, top, left + viewbox[0] * scale, top + viewbox[1] * scale))
+
+    _assert_masks_match(ac._fit_master(master, extent, size), expected)
+
+
+@pytest.mark.skipif(not ac.HAS_CAIROSVG, reason="cairosvg not installed")
+@pytest.mark.parametrize("shape", ["portal_shape.svg", "mask_shape.svg"])
+@pytest.mark.parametrize("size", SIZES)
+def test_svg_master_matches_direct_render(shape, size):
+    shape_path = os.path.join(REPO_ROOT, shape)
+    mask = ac._render_shape_mask(shape_path, os.path.getmtime(shape_path), size)
+    _assert_masks_match(mask, ac._rasterize_svg(shape_path, size))
+
+
+def test_white_svg_keeps_namespaces_local(tmp_path):
+    shape_path = str(tmp_path / "shape.svg")
+    with open(shape_path, "w") as f:
+        f.write('<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink">'
+                '<defs><path id="p" d="M0 0H9V9Z" style="fill:red;stroke:none"/></defs>'
+                '<use xlink:href="#p"/></svg>')
+
+    svg = ac._white_svg(shape_path, os.path.getmtime(shape_path))
+    assert b"ns0" not in svg and b"<svg " in svg and b'xlink:href="#p"' in svg
+    root = ET.fromstring(svg)
+    assert root.tag == "{http://www.w3.org/2000/svg}svg"
+    assert root.find(".//{http://www.w3.org/2000/svg}path").get("style") == "stroke:none"
+    # Nothing registered with ElementTree for every other caller
+    assert "http://www.w3.org/2000/svg" not in ET._namespace_map
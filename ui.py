@@ -3,7 +3,7 @@ Interactive UI for tweaking avatar compositor settings.
 """
 
 import gradio as gr
-from avatar_compositor import composite_avatar, PortalGradient, AvatarConfig
+from avatar_compositor import composite_avatar, PortalGradient, AvatarConfig, IMAGING_BACKEND
 
 
 def generate_avatar(
@@ -64,7 +64,8 @@ def generate_avatar(
     if add_white_bg:
         from PIL import Image
         bg = Image.new("RGBA", result.size, (255, 255, 255, 255))
-        result = Image.alpha_composite(bg, result)
+        bg.alpha_composite(result)
+        result = bg
 
     return result
 
@@ -132,12 +133,29 @@ with gr.Blocks(title="Avatar Compositor") as app:
         add_white_bg
     ]
 
-    generate_btn.click(fn=generate_avatar, inputs=all_inputs, outputs=output_image)
-
-    # Auto-generate on any change
-    for input_component in all_inputs:
-        input_component.change(fn=generate_avatar, inputs=all_inputs, outputs=output_image)
-
+    # Auto-generate on any change shares one event, so a render in progress
+    # has at most one queued follow-up for all inputs combined: while it
+    # runs, every newer change replaces the pending one, and only the last
+    # values get rendered once the user stops dragging. Progress stays hidden
+    # so the preview doesn't flicker while dragging. The button gets its own
+    # event with the default progress display; the shared concurrency_id
+    # keeps a click and a change render from running at the same time.
+    gr.on(
+        triggers=[component.change for component in all_inputs],
+        fn=generate_avatar,
+        inputs=all_inputs,
+        outputs=output_image,
+        trigger_mode="always_last",
+        show_progress="hidden",
+        concurrency_id="generate"
+    )
+    generate_btn.click(
+        fn=generate_avatar,
+        inputs=all_inputs,
+        outputs=output_image,
+        concurrency_id="generate"
+    )
 
 if __name__ == "__main__":
+    print(f"Imaging backend: {IMAGING_BACKEND}")
     app.launch()